@@ -29,5 +29,6 @@ setup(
     ],
     extras_require={
         "testing": ['pyfakefs'],
+        "fast": ['orjson'],
     },
 )
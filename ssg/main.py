@@ -1,22 +1,117 @@
 import os
+import posixpath
 import sys
+import io
 import shutil
+import stat
 import tomllib
 import json
 import re
 import datetime
+import bisect
+import hashlib
+import importlib.metadata
+import pickle
+import multiprocessing
+import concurrent.futures
+from dataclasses import dataclass, field
 from pathlib import Path
 
-from typing import NamedTuple, Any, Optional
+from typing import NamedTuple, Any, Optional, Callable, Iterator, Sequence
 
 import jinja2 as jinja
 import imagesize  # type: ignore
 import commonmark
+try:
+    import orjson  # type: ignore
+except ImportError:  # optional, installed with the "fast" extra
+    orjson = None  # type: ignore
 
 VERSION = "0.1"
+CACHE_DIR = ".ssg-cache"
+SHARD_RE = re.compile(r"<!--\s*shard:\s*([\w.]+)\s*-->\s*$", re.M)
+# a run of digits that may be an integer orjson can't represent exactly
+LONG_DIGITS_RE = re.compile(rb"\d{19}")
+# a versioned filename, e.g. styles.4.css, split into stem, version and suffix
+VER_RE = re.compile(r"(\.*[^.].*)\.([0-9]+)(\.[^.]+)")
+# minimum number of pages before they are parsed, or tasks before they are
+# rendered, by a process pool
+PARALLEL_THRESHOLD = 64
+
+
+class Siblings(Sequence[str]):
+    """The siblings of a page: a read-only view of the ordered page ids of its
+    directory, optionally omitting the page itself. All the pages of a
+    directory share one tuple of ids, rather than each having its own list.
+    Siblings compare equal to lists and tuples with the same items, and
+    concatenate with lists to give lists.
+    """
+    __slots__ = ("ids", "omit")
+
+    def __init__(self, ids: tuple[str, ...], omit: Optional[int] = None):
+        """
+        :param ids: The ordered page ids of the directory
+        :param omit: The index in ids of the page to omit, if any
+        """
+        self.ids = ids
+        self.omit = omit
+
+    def __len__(self) -> int:
+        return len(self.ids) - (self.omit is not None)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("siblings index out of range")
+        if self.omit is not None and i >= self.omit:
+            i += 1
+        return self.ids[i]
+
+    def __iter__(self) -> Iterator[str]:
+        for c, X in enumerate(self.ids):
+            if c != self.omit:
+                yield X
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Siblings, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore  # equal to lists, which are unhashable
+
+    def __add__(self, other: object) -> list[str]:
+        if isinstance(other, (Siblings, list)):
+            return list(self) + list(other)
+        return NotImplemented
+
+    def __radd__(self, other: object) -> list[str]:
+        if isinstance(other, list):
+            return other + list(self)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def json_default(o: Any) -> Any:
+    """Convert objects that the json module can't serialize, for the tojson
+    filter.
+
+    :param o: The object to convert
+    :returns: A list of the items of a Siblings object
+    :raises TypeError: If o is of any other type
+    """
+    if isinstance(o, Siblings):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__}"
+                    " is not JSON serializable")
 
 
-class Page(NamedTuple):
+@dataclass(slots=True)
+class Page:
     id: str
     # output file
     path: Optional[str]
@@ -30,7 +125,7 @@ class Page(NamedTuple):
     tags: list[str]
     # sibling processing
     weight: Optional[int]
-    siblings: list[str] = []
+    siblings: Sequence[str] = field(default_factory=list)
     lighter: str | None = None
     heavier: str | None = None
 
@@ -40,29 +135,119 @@ class ImageInfo(NamedTuple):
     height: int
 
 
-class Task(NamedTuple):
+@dataclass(slots=True, frozen=True, order=True)
+class Task:
     page_id: str
     latest_timestamp: int
     template: str
     output_path: Path
 
 
-class Library(NamedTuple):
+@dataclass(slots=True)
+class Library:
     pages: dict[str, Page]
     tasks: list[Task]
-    versioned: dict[Path, int]
-    image_info: dict[Path, ImageInfo]
+    versioned: dict[str, int]
+    image_info: dict[str, Optional[ImageInfo]]
     tags: dict[str, list[str]]
     assets: list[Path]
+    content_dir: Path = Path()
+
+
+class FingerprintCache:
+    """A persistent mapping from fingerprints of inputs to results derived
+    from them. The mapping is loaded from disk when the cache is created and
+    written back by save. Only entries that were looked up or stored since
+    the cache was loaded are saved, so entries that are no longer referenced
+    by the site are discarded.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Load the cache.
+
+        :param path: The path of the cache file. If it does not exist, or was
+            written by different code (see CODE_FINGERPRINT), the cache
+            starts empty.
+        """
+        self.path = path
+        self.old: dict[bytes, Any] = {}
+        self.new: dict[bytes, Any] = {}
+        try:
+            with open(path, "rb") as f:
+                version, entries = pickle.load(f)
+            if version == CODE_FINGERPRINT:
+                self.old = entries
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            pass  # treat missing or corrupt cache as empty
+
+    def get(self, key: bytes) -> Any:
+        """Look up key, marking it as in use.
+
+        :param key: A fingerprint, as returned by fingerprint
+        :returns: The stored value or None if key is not in the cache.
+        """
+        if key not in self.new and key in self.old:
+            self.new[key] = self.old[key]
+        return self.new.get(key)
+
+    def __setitem__(self, key: bytes, value: Any) -> None:
+        self.new[key] = value
+
+    def save(self) -> None:
+        """Write the entries in use back to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as f:
+            pickle.dump((CODE_FINGERPRINT, self.new), f)
+
+
+def fingerprint(*parts: bytes) -> bytes:
+    """Calculate a fingerprint of a sequence of byte strings.
+
+    :param parts: The byte strings to fingerprint
+    :returns: A 16 byte BLAKE2b digest
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.digest()
+
+
+def code_fingerprint() -> bytes:
+    """Calculate a fingerprint of the code that builds the site: the version
+    of Python, the source of this module and the versions of the packages it
+    uses. Cached results are only valid for the same code.
+
+    :returns: The fingerprint
+    """
+    parts = [VERSION.encode(), sys.version.encode()]
+    try:
+        with open(__file__, "rb") as f:
+            parts.append(f.read())
+    except OSError:
+        pass  # e.g. imported from a zip; the package versions still count
+    for name in ("Jinja2", "MarkupSafe", "commonmark", "imagesize", "orjson"):
+        try:
+            version = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            version = ""
+        parts.append(f"{name} {version}".encode())
+    return fingerprint(*parts)
+
+
+# computed once, on import
+CODE_FINGERPRINT = code_fingerprint()
 
 
 def status_message(msg: str) -> None:
-    """Writes msg to stdout with a timestamp.
+    """Writes msg to stdout with a timestamp. When run from main, stdout is
+    not line buffered, so messages are flushed in batches.
 
     :param msg: The message to write
     :returns: None
     """
-    print(f"[{datetime.datetime.now().isoformat()}] {msg}", file=sys.stdout)
+    timestamp = datetime.datetime.now().isoformat(timespec="milliseconds")
+    sys.stdout.write(f"[{timestamp}] {msg}\n")
 
 
 def error_message(msg: str, notes: list[str] = []) -> None:
@@ -71,6 +256,7 @@ def error_message(msg: str, notes: list[str] = []) -> None:
     :param msg: The message to write
     :returns: None:
     """
+    sys.stdout.flush()  # so that status messages appear before the error
     print(f"[ERROR] {msg}", file=sys.stderr)
     for note in notes:
         print(f"        {note}", file=sys.stderr)
@@ -83,21 +269,78 @@ def find_site_root() -> Optional[Path]:
     :returns: The path of the directory or None if not found
 
     """
-    p = Path.cwd()
-    while p.name:
-        if (p / "content").is_dir() and (p / "templates").is_dir():
-            return p
-        p = p.parent
+    p = os.getcwd()
+    # the filesystem root, which is its own parent, is not checked
+    while (parent := os.path.dirname(p)) != p:
+        if (os.path.isdir(os.path.join(p, "content")) and
+                os.path.isdir(os.path.join(p, "templates"))):
+            return Path(p)
+        p = parent
     return None
 
 
-def process_content(filepath: Path) -> Any:
+def read_and_stat(path: Path) -> tuple[bytes, int]:
+    """Read a file and find its modification time with a single open.
+
+    :param path: The path of the file
+    :returns: A tuple of the content of the file and its st_mtime_ns
+    :raises OSError: If path does not lead to a readable file
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        st = os.fstat(fd)
+        data = os.read(fd, st.st_size)
+        while len(data) < st.st_size and (chunk := os.read(fd, 1 << 20)):
+            data += chunk  # short read
+        return (data, st.st_mtime_ns)
+    finally:
+        os.close(fd)
+
+
+def write_file(path: Path, data: bytes) -> None:
+    """Write data to a file with os.write, bypassing Python's buffered and
+    text layers since the whole content is already in memory.
+
+    :param path: The path of the file, which is created or truncated
+    :param data: The content to write
+    :raises OSError: If the file cannot be written
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    fd = os.open(path, flags, 0o666)
+    try:
+        view = memoryview(data)
+        while view:  # in chunks, since os.write may write partially
+            view = view[os.write(fd, view[:1 << 20]):]
+    finally:
+        os.close(fd)
+
+
+def decode_text(data: bytes) -> str:
+    """Decode UTF-8 data, translating line endings as Path.read_text would.
+
+    :param data: The raw content of a text file
+    :returns: The decoded text with all line endings converted to "\\n"
+    :raises UnicodeDecodeError: If data is not valid UTF-8
+    """
+    text = data.decode()
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def process_content(
+        filepath: Path, cache: Optional[FingerprintCache] = None,
+        data: Optional[bytes] = None
+) -> Any:
     '''Process a toml, json, or generic text file.
 
     TOML files are identified by a ".toml" suffix, and JSON files are
     identified by a ".json" suffix. If the content is TOML, it is simply handed
     to tomllib and the resulting dict returned. Similarly, JSON is passed to
-    the json module and the resulting data structure is returned.
+    the json module and the resulting data structure is returned. If orjson
+    is installed, it is tried first, since it is much faster, unless the
+    content contains a run of 19 or more digits, which orjson may not parse
+    to the same value.
 
     If the file is neither TOML nor JSON, it is treated as a text file that may
     optionally be sharded. Sharded content is divided into sections by shard
@@ -116,15 +359,17 @@ def process_content(filepath: Path) -> Any:
     <!-- shard: c -->
     shard c
 
-    converts to the TOML:
+    is equivalent to the TOML:
 
     a.b = ["""shard a.b 1""", """shard a.b 2"""]
     c = """shard c"""
 
     Note that where the same identifier is used multiple times, it binds the
     identifier to an array of multiline strings, wheras if the identifier is
-    unique, it binds the identifier to a single multiline string. When
-    processed by tomllib, this will return:
+    unique, it binds the identifier to a single multiline string. The shards
+    are not actually passed through tomllib, so they are not subject to TOML
+    escape processing, but the dotted identifiers are interpreted as they
+    would be in TOML. The example returns:
 
     {'a': {'b': ['shard a.b 1', 'shard a.b 2']},
      'c': 'shard c'}
@@ -132,14 +377,19 @@ def process_content(filepath: Path) -> Any:
     :param filepath: The path to a content file. TOML files should have ".toml"
         suffix and JSON files should have a ".json" suffix. A file with any
         other suffix is checked for a shard marker on the first line; if
-        present, the file will be converted to TOML. If there is no shard
+        present, the file will be split into shards. If there is no shard
         marker, the file is treated as a generic text file.
 
+    :param cache: If given, parsed TOML, JSON and sharded content are stored
+        in the cache, keyed by a fingerprint of the suffix and file content,
+        and files that have been parsed before are not parsed again.
+
+    :param data: The content of filepath, if it has already been read.
+
     :return: For files with a ".toml" suffix, the result of passing the file
         content to tomllib.loads. For files with a ".json" suffix, the result
-        of passing it to json.loads. For any other file, if sharded, the result
-        of converting to TOML and then passing to tomllib.loads, otherwise the
-        unprocessed text content of the file.
+        of passing it to json.loads. For any other file, if sharded, a dict
+        of the shards, otherwise the unprocessed text content of the file.
 
     :raises OSError: If filepath does not lead to a readable file
 
@@ -152,37 +402,79 @@ def process_content(filepath: Path) -> Any:
     :raises TOMLDecodeError: If filepath has suffix ".toml" but does not
         contain valid TOML.
 
+    :raises TypeError: If the file is sharded and a shard identifier is
+        invalid or conflicts with another shard identifier.
+
     '''
     try:
-        content = filepath.read_text()
-        if filepath.suffix == ".json":
-            return json.loads(content)
-        if filepath.suffix == ".toml":
-            return tomllib.loads(content)
-        shard_re = r"<!--\s*shard:\s*([\w.]+)\s*-->\s*$"
-        shards = re.split(shard_re, content, flags=re.M)
-        if len(shards) > 1 and shards[0] == "":  # Sharded content
-            shard_dict: dict[str, list[str]] = {}
-            for id_, shard in zip(shards[1::2], shards[2::2]):
-                shard = shard.replace('"""', r'""\"').strip()
-                shard_dict.setdefault(id_, []).append(shard)
-            statements = []
-            for k, v in shard_dict.items():
-                if len(v) > 1:
-                    array = ', '.join((f'"""{X}"""' for X in v))
-                    statements.append(f"{k} = [{array}]")
-                else:
-                    statements.append(f'{k} = """{v[0]}"""')
-            return tomllib.loads("\n".join(statements))
-        return content  # Any other text content
-    except (OSError, json.JSONDecodeError,
-            UnicodeDecodeError, tomllib.TOMLDecodeError) as e:
+        if data is None:
+            data, _ = read_and_stat(filepath)
+        return parse_content(filepath.suffix, data, cache)
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError,
+            tomllib.TOMLDecodeError, TypeError) as e:
         e.add_note(f"While processing {filepath}")
         raise e
 
 
+def parse_content(
+        suffix: str, data: bytes, cache: Optional[FingerprintCache] = None
+) -> Any:
+    """Parse the content of a file as described for process_content.
+
+    :param suffix: The suffix of the file
+    :param data: The content of the file
+    :param cache: An optional cache of previously parsed content
+    :returns: The parsed content
+    """
+    if cache is not None:
+        key = fingerprint(suffix.encode(), data)
+        if (result := cache.get(key)) is None:
+            result = parse_content(suffix, data)
+            if not isinstance(result, str):  # not worth caching plain text
+                cache[key] = result
+        return result
+    if suffix == ".json":
+        # orjson turns integers that don't fit in 64 bits into floats
+        if orjson is not None and not LONG_DIGITS_RE.search(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # UTF-16/32 or non-standard JSON that the json module
+                # accepts, or an error to be reported as the json module
+                # would report it
+                pass
+        return json.loads(data)
+    if suffix == ".toml":
+        return tomllib.loads(decode_text(data))
+    content = decode_text(data)
+    # Sharded content. The cheap prefix test keeps plain text out of the
+    # regex engine.
+    if content.startswith("<!--") and SHARD_RE.match(content):
+        parts = SHARD_RE.split(content)
+        shard_dict: dict[str, list[str]] = {}
+        for id_, shard in zip(parts[1::2], parts[2::2]):
+            shard_dict.setdefault(id_, []).append(shard.strip())
+        shards: dict[str, Any] = {}
+        for id_, v in shard_dict.items():
+            *tables, shard_key = id_.split(".")
+            if "" in tables or not shard_key:
+                raise TypeError(f"Invalid shard identifier '{id_}'")
+            table = shards
+            for k in tables:
+                table = table.setdefault(k, {})
+                if not isinstance(table, dict):
+                    break
+            if not isinstance(table, dict) or shard_key in table:
+                raise TypeError(f"Shard identifier '{id_}' conflicts"
+                                " with another shard identifier")
+            table[shard_key] = v if len(v) > 1 else v[0]
+        return shards
+    return content  # Any other text content
+
+
 def process_page_file(
-        content_dir: Path, subdirs: list[Path], page_id: str
+        content_dir: Path, subdirs: list[str], page_id: str,
+        cache: Optional[FingerprintCache] = None
 ) -> tuple[Page, Optional[Task]]:
     """Load the .page file in the content_dir with page_id identifier, and
     extract all the attributes required to fill a Page structure. Also extract
@@ -194,20 +486,22 @@ def process_page_file(
     :param page_id: The identifier of the page. This is the path from the
                     content directory to the file, with the ".page" extension
                     removed.
+    :param cache: An optional cache of previously parsed content.
     :returns: The Page structure and the template.
 
     """
     status_message(f"Parsing {page_id}")
-    page_path = (content_dir / page_id).with_suffix(".page")
-    latest_timestamp = os.stat(page_path).st_mtime_ns
-    with open(page_path, "rb") as f:
-        toml = tomllib.load(f)
+    # string operations rather than Path methods, which are slow
+    page_path = content_dir / f"{page_id}.page"
+    page_data, latest_timestamp = read_and_stat(page_path)
+    toml = parse_content(".toml", page_data, cache)
     content = {}
     try:
         for k, v in toml.get("content", {}).items():
             path = page_path.parent / v
-            latest_timestamp = max(latest_timestamp, os.stat(path).st_mtime_ns)
-            content[k] = process_content(path)
+            data, mtime = read_and_stat(path)
+            latest_timestamp = max(latest_timestamp, mtime)
+            content[k] = process_content(path, cache, data)
     except (AttributeError, FileNotFoundError):
         raise TypeError("Field 'content' must be a"
                         " TOML table of identifiers and valid filepaths.")
@@ -217,26 +511,28 @@ def process_page_file(
             raise TypeError("Field 'template' must be"
                             " a string giving a relative template path")
         suffix = toml.get("suffix", ".html")
-        if not isinstance(suffix, str):
-            raise TypeError("Field 'suffix' must be a string")
-        path = Path(page_id).with_suffix(suffix)
-        dir_ = path.parent.as_posix()
-        name = path.name
-        str_path = path.as_posix()
-        task = Task(page_id, latest_timestamp, toml["template"], path)
+        if (not isinstance(suffix, str) or
+                (suffix and (suffix[0] != "." or "/" in suffix))):
+            raise TypeError("Field 'suffix' must be a string that is empty"
+                            " or starts with '.'")
+        str_path = page_id + suffix
+        name = posixpath.basename(str_path)
+        # template names and tags repeat across pages, so share one string
+        task = Task(page_id, latest_timestamp, sys.intern(toml["template"]),
+                    Path(str_path))
     else:
         task = None
-        dir_ = Path(page_id).parent.as_posix()
         str_path, name = "", ""
+    dir_ = posixpath.dirname(page_id) or "."
     tags = toml.get("tags", [])
     if ((not isinstance(tags, list)) or
-            sum([not isinstance(X, str) for X in tags])):
+            any(not isinstance(X, str) for X in tags)):
         raise TypeError("Field 'tags' must be a list of strings")
     weight = process_weight(toml, page_id)
     page = Page(
         page_id,
-        str_path, dir_, name, [X.as_posix() for X in subdirs],
-        content, data, toml.get("tags", []), weight
+        str_path, dir_, name, subdirs,
+        content, data, [sys.intern(X) for X in tags], weight
     )
     return (page, task)
 
@@ -264,88 +560,195 @@ def process_weight(toml: dict[str, Any], page_id: str) -> None | int:
     return weight
 
 
-def sort_siblings(
-        siblings: set[str], me: str, pages: dict[str, Page]
-) -> tuple[list[str], Optional[str], Optional[str]]:
-    """Establish the relationship between pages in the same directory.
+def fix_siblings(pages: dict[str, Page]) -> None:
+    """Fill in sibling related fields for each page in pages. This function
+    mutates the Page objects in place, and so returns nothing.
 
-    :param siblings: A set of page identifiers to sort
-    :param me: The page identifier to sort relative to
-    :param pages: A dictionary of Page objects, keyed by their page identifier
+    The siblings of a page are the pages in the same directory that have a
+    weight and an output file, ordered by weight then page identifier. A page
+    is omitted from its own siblings. Pages with a weight also have lighter
+    and heavier set to their neighbours in that order.
 
-    :returns: A tuple of three values. The first value is a list of pages
-              ordered by weight then filename omitting the page identified by
-              the me paramater. The second and third are the page identifier
-              before me and the page identifier after me respectively.
+    :param pages: A mapping of page_ids to Page objects.
+    :returns: None. The Page objects in pages are mutated.
     """
 
     def key(a):
         return (pages[a].weight, a)
 
-    lighter, heavier = [], []
-    if pages[me].weight is None:
-        return (sorted(siblings, key=key), None, None)
-    else:
-        for s in siblings - {me}:
-            if key(s) < key(me):
-                lighter.append(s)
-            else:
-                heavier.append(s)
-        lighter.sort(key=key)
-        heavier.sort(key=key)
-        return ((lighter + heavier),
-                lighter[-1] if lighter else None,
-                heavier[0] if heavier else None)
+    # build sorted sibling lookup dict
+    unsorted: dict[str, list[str]] = {}
+    for page_id, page in pages.items():
+        if page.weight is None or not page.path:
+            continue
+        unsorted.setdefault(os.path.dirname(page_id), []).append(page_id)
+    sibling_dict: dict[str, tuple[str, ...]] = {}
+    position: dict[str, int] = {}
+    for dir_, ids in unsorted.items():
+        ordered = sibling_dict[dir_] = tuple(sorted(ids, key=key))
+        position.update((X, c) for c, X in enumerate(ordered))
+    # assign siblings, sharing each directory's tuple
+    for page_id, page in pages.items():
+        if (group := sibling_dict.get(os.path.dirname(page_id))) is None:
+            continue
+        if page.weight is None:
+            page.siblings = Siblings(group)
+            continue
+        if page_id in position:
+            c = position[page_id]
+            page.siblings = Siblings(group, c)
+            heavier = c + 1
+        else:  # weighted page without an output file
+            c = bisect.bisect_left([key(X) for X in group], key(page_id))
+            page.siblings = Siblings(group)
+            heavier = c
+        page.lighter = group[c - 1] if c > 0 else None
+        page.heavier = group[heavier] if heavier < len(group) else None
+
+
+def list_dir(path: str) -> tuple[list[os.DirEntry], list[os.DirEntry]]:
+    """List a directory with os.scandir, separating directories from files.
+
+    :param path: The directory to list
+    :returns: A tuple of the DirEntry objects of the subdirectories and the
+        DirEntry objects of everything else. As with os.walk, a directory
+        that cannot be listed is treated as empty.
+    """
+    dirs: list[os.DirEntry] = []
+    files: list[os.DirEntry] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                (dirs if entry.is_dir() else files).append(entry)
+    except OSError:
+        pass
+    return dirs, files
+
+
+def walk_content(
+        path: str, prefix: str = "",
+        listing: Optional[tuple[list[os.DirEntry], list[os.DirEntry]]] = None
+) -> Iterator[tuple[str, list[str], list[os.DirEntry]]]:
+    """Walk a directory tree top down, in the same order as os.walk.
+
+    Each directory is listed once. The listing of a subdirectory is made
+    before its parent is yielded, so that whether it contains an .ignore file
+    is known without a further system call. As with os.walk, symbolic links
+    to directories are reported but not followed.
+
+    :param path: The directory at the top of the tree
+    :param prefix: The relative path of path, for use in recursion
+    :param listing: The list_dir result for path, for use in recursion
+    :returns: An iterator yielding, for each directory, a tuple of its POSIX
+        path relative to the top with a trailing "/" (empty for the top
+        directory), the names of its subdirectories that do not contain an
+        .ignore file, and the DirEntry objects of its files.
+    """
+    dirs, files = listing or list_dir(path)
+    children = [(X, list_dir(X.path)) for X in dirs]
+    subdirs = [X.name for X, (_, f) in children
+               if not any(Y.name == ".ignore" for Y in f)]
+    yield prefix, subdirs, files
+    for entry, child_listing in children:
+        if not entry.is_symlink():
+            yield from walk_content(
+                entry.path, f"{prefix}{entry.name}/", child_listing)
+
+
+def map_in_pool(
+        fn: Callable[..., Any], initializer: Callable[..., None],
+        initargs: tuple[Any, ...], *iterables: list[Any]
+) -> Optional[list[Any]]:
+    """Map fn over iterables in a pool of worker processes, if that is
+    worthwhile: there must be at least PARALLEL_THRESHOLD items, and the
+    platform must be Linux, where workers can safely be forked. Forked workers
+    inherit initargs from this process rather than having them pickled.
+
+    :param fn: The function to call in the workers, with an item from each of
+        iterables
+    :param initializer: The function to call with initargs as each worker
+        starts
+    :param initargs: The arguments for initializer
+    :param iterables: Lists of the same length giving the arguments for fn
+    :returns: The results of fn in order, or None if a pool is not used, in
+        which case the caller should do the work in this process.
+    """
+    n_items = len(iterables[0])
+    if n_items < PARALLEL_THRESHOLD or sys.platform != "linux":
+        return None
+    workers = os.cpu_count() or 1
+    chunksize = max(1, n_items // (workers * 4))
+    sys.stdout.flush()  # don't duplicate buffered output in workers
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=initializer, initargs=initargs) as executor:
+        return list(executor.map(fn, *iterables, chunksize=chunksize))
+
+
+def load_page(
+        content_dir: Path, subdirs: list[str], page_id: str,
+        cache: Optional[FingerprintCache] = None
+) -> tuple[Page, Optional[Task]]:
+    """Call process_page_file, noting the page file on any exception."""
+    try:
+        return process_page_file(content_dir, subdirs, page_id, cache)
+    except BaseException as e:
+        e.add_note(f"While processing {content_dir / page_id}.page")
+        raise e
 
 
-def fix_siblings(pages: dict[str, Page]) -> None:
-    """Fill in sibling related fields for each page in pages. This function
-    mutates pages, and so returns nothing.
+_worker_content: Optional[tuple[Path, Optional[FingerprintCache]]] = None
 
-    :param pages: A mapping of page_ids to Page objects.
-    :returns: None. The pages dict is mutated.
-    """
-    dirnames = {K: os.path.dirname(K) for K in pages.keys()}
-    # build sibling set lookup dict
-    sibling_dict: dict[str, set] = {}
-    for page_id in pages:
-        if pages[page_id].weight is None or not pages[page_id].path:
-            continue
-        dir_ = dirnames[page_id]
-        if dir_ not in sibling_dict:
-            sibling_dict[dir_] = set()
-        sibling_dict[dir_].add(page_id)
-    # assign siblings
-    for page_id in pages:
-        dir_ = dirnames[page_id]
-        if dir_ not in sibling_dict:
-            continue
-        siblings, lighter, heavier = sort_siblings(
-            sibling_dict[dir_], page_id, pages)
-        pages[page_id] = pages[page_id]._replace(
-            siblings=siblings,
-            lighter=lighter,
-            heavier=heavier)
+
+def _init_load_worker(
+        content_dir: Path, cache: Optional[FingerprintCache]
+) -> None:
+    global _worker_content
+    _worker_content = (content_dir, cache)
+
+
+def _load_in_worker(
+        page_id: str, subdirs: list[str]
+) -> tuple[Page, Optional[Task], dict[bytes, Any]]:
+    assert _worker_content
+    content_dir, cache = _worker_content
+    if cache is None:
+        return (*load_page(content_dir, subdirs, page_id), {})
+    # return the cache entries used, since the parent's cache is not shared
+    cache.new = {}
+    return (*load_page(content_dir, subdirs, page_id, cache), cache.new)
 
 
 def asset_list(content_dir: Path) -> list[Path]:
+    """List the files that are copied to the output: everything except .page
+    files and the contents of directories containing an .ignore file.
+
+    :param content_dir: The path to the content directory
+    :returns: The paths of the assets, relative to content_dir
+    """
     assets: list[Path] = []
-    for root, dirs, files in os.walk(content_dir):
-        for c, dir in enumerate(dirs):
-            if Path(root, dir, ".ignore").exists():
-                del dirs[c]
-        for f in files:
-            fullpath = Path(root, f)
-            if fullpath.suffix != ".page":
-                assets.append(fullpath.relative_to(content_dir))
+    visible = {""}
+    for prefix, subdirs, entries in walk_content(str(content_dir)):
+        if prefix in visible:
+            visible.update(f"{prefix}{X}/" for X in subdirs)
+            assets.extend(Path(prefix + X.name) for X in entries
+                          if not X.name.endswith(".page"))
     return assets
 
 
-def build_library(content_dir: Path) -> Library:
+def build_library(
+        content_dir: Path, cache: Optional[FingerprintCache] = None
+) -> Library:
     """Create a library containing the information needed to process the .page
     files into output files from the files in the content directory.
 
+    Page files are parsed by a pool of worker processes where map_in_pool
+    finds that worthwhile. Otherwise they are loaded by a pool of threads,
+    which overlaps the system calls.
+
     :param content_dir: The path to the content directory.
+    :param cache: An optional cache of previously parsed content.
 
     :returns: A library object with the following fields:
 
@@ -356,55 +759,82 @@ def build_library(content_dir: Path) -> Library:
         templates: A dictionary linking page identifiers to the template that
             should be used to build the output file.
 
-        versioned: A dictionary linking an unversioned filepath to the filepath
-            with the highest version. For example if css/styles.1.css and
-            css/styles.2.css both exist, css/styles.css will be the key and
-            css.styles.2.css will be the value. Used by the 'latest' custom
-            filter.
+        versioned: A dictionary linking an unversioned filepath, as a POSIX
+            path string, to the highest version of that file. For example if
+            css/styles.1.css and css/styles.2.css both exist, "css/styles.css"
+            will be the key and 2 will be the value. Used by the 'latest'
+            custom filter.
 
-        image_info: A dictionary linking image urls to ImageInfo objects, which
+        image_info: A dictionary linking image paths, as POSIX path strings
+            relative to the content directory, to ImageInfo objects, which
             contain the width and height of the image. Used by the dimensions
-            custom filter.
+            custom filter. The values are None until the dimensions filter
+            first reads the image.
 
         tags: A dictionary linking tag strings to lists of page ids with those
             tags.
+
+        assets: A list of the files that are copied to the output.
+
+        content_dir: The content directory that the library was built from.
     """
     assert content_dir.is_dir()
     pages: dict[str, Page] = {}
     tasks: list[Task] = []
-    image_info: dict[Path, ImageInfo] = {}
-    max_version: dict[Path, int] = {}
+    image_info: dict[str, Optional[ImageInfo]] = {}
+    max_version: dict[str, int] = {}
     status_message("Building Library")
-    for dirpath, dirnames, filenames in os.walk(content_dir):
-        for f in filenames:
-            filepath = Path(dirpath) / f
-            relpath = filepath.relative_to(content_dir)
+    # plain strings rather than Path objects, which are slow to construct
+    page_ids: list[str] = []
+    subdir_lists: list[list[str]] = []
+    assets: list[Path] = []
+    # directories that are not within an ignored directory
+    visible = {""}
+    for prefix, subdirs, entries in walk_content(str(content_dir)):
+        is_visible = prefix in visible
+        if is_visible:
+            visible.update(f"{prefix}{X}/" for X in subdirs)
+        for entry in entries:
+            f = entry.name
+            base, suffix = os.path.splitext(f)
             # .page files
-            if relpath.suffix == ".page":
-                page_id = relpath.with_suffix("").as_posix()
-                subdirs = [Path(X) for X in dirnames
-                           if not Path(dirpath, X, ".ignore").exists()]
-                try:
-                    page, task = process_page_file(
-                        content_dir, subdirs, page_id)
-                except BaseException as e:
-                    e.add_note(f"While processing {filepath}")
-                    raise e
-                if page:
-                    pages[page_id] = page
-                if task:
-                    tasks.append(task)
+            if suffix == ".page":
+                page_ids.append(prefix + base)
+                subdir_lists.append(subdirs)
                 continue
-            # image files for dimensions
-            if relpath.suffix in (".jpeg", ".jpg", ".webp", ".png", ".gif"):
-                image_info[relpath] = ImageInfo(*imagesize.get(filepath))
+            relpath = prefix + f
+            if is_visible:
+                assets.append(Path(relpath))
+            # image files for dimensions, which are read when first required
+            if suffix in (".jpeg", ".jpg", ".webp", ".png", ".gif"):
+                image_info[relpath] = None
             # versioned files for max version mapping
-            process_versioned(relpath, max_version)
+            process_versioned(prefix, f, max_version)
+    # parsing TOML is CPU bound, so use processes to avoid the GIL
+    pool_results = map_in_pool(_load_in_worker, _init_load_worker,
+                               (content_dir, cache), page_ids, subdir_lists)
+    if pool_results is None:
+        # small sites are dominated by system calls, so overlap them
+        with concurrent.futures.ThreadPoolExecutor(max_workers=32) as executor:
+            loaded = list(executor.map(
+                lambda a, b: load_page(content_dir, b, a, cache),
+                page_ids, subdir_lists))
+    else:
+        loaded = []
+        for page, task, cache_entries in pool_results:
+            loaded.append((page, task))
+            if cache is not None:
+                for key, value in cache_entries.items():
+                    cache[key] = value
+    for page, task in loaded:
+        pages[page.id] = page
+        if task:
+            tasks.append(task)
     fix_siblings(pages)
     tags = process_tags(pages)
-    assets = asset_list(content_dir)
     status_message("Finished building library")
-    return Library(pages, tasks, max_version, image_info, tags, assets)
+    return Library(pages, tasks, max_version, image_info, tags, assets,
+                   content_dir)
 
 
 def process_tags(pages: dict[str, Page]) -> dict[str, list[str]]:
@@ -423,20 +853,23 @@ def process_tags(pages: dict[str, Page]) -> dict[str, list[str]]:
     return tags
 
 
-def process_versioned(path: Path, max_version: dict[Path, int]) -> None:
+def process_versioned(
+        prefix: str, name: str, max_version: dict[str, int]
+) -> None:
     """Update max_version dict given a relative path.
 
-    :param relpath: The path to check for versioning
-    :param max_version: The dict recording latest versions of paths.
+    :param prefix: The POSIX path of the file's directory, relative to the
+        content directory, with a trailing "/" (empty for the top directory)
+    :param name: The filename to check for versioning
+    :param max_version: The dict recording latest versions of paths, keyed
+        by the POSIX form of the unversioned path.
     :returns: None. The max_version param is mutated
     """
-    try:
-        version = int(path.suffixes[-2][1:])
-        key = path.with_suffix("").with_suffix(path.suffix)
-        if version > max_version.get(key, 0):
-            max_version[key] = version
-    except (ValueError, IndexError):
-        pass  # not a versioned file
+    if (m := VER_RE.fullmatch(name)) is None:
+        return  # not a versioned file
+    key = f"{prefix}{m[1]}{m[3]}"
+    if (version := int(m[2])) > max_version.get(key, 0):
+        max_version[key] = version
 
 
 def define_jinja_filters(library: Library, env: jinja.Environment) -> None:
@@ -446,6 +879,10 @@ def define_jinja_filters(library: Library, env: jinja.Environment) -> None:
     :param env: The Jinja environment to mutate.
     :return: This function mutates env, so returns None.
     """
+    # the same URLs are looked up from many pages, so memoize the results
+    # and keys; library.versioned is complete before rendering starts
+    latest_urls: dict[tuple[str, str], str] = {}
+    image_keys: dict[tuple[str, str], str] = {}
 
     @jinja.pass_context
     def latest(context, s: str) -> str:
@@ -460,22 +897,34 @@ def define_jinja_filters(library: Library, env: jinja.Environment) -> None:
         :return: The transformed URL, also relative to the page.
 
         """
-        path = Path(s)
-        # note: pathlib cannot normalize a relative path
-        if path.root:
-            key = Path(os.path.normpath(path.relative_to(path.root)))
-        else:
-            key = Path(os.path.normpath(Path(context["page"].dir, s)))
-        if key in library.versioned:
-            return str(path.with_suffix(
-                f".{library.versioned[key]}{path.suffix}"))
-        return s
+        dir_ = context["page"].dir
+        if (url := latest_urls.get((dir_, s))) is None:
+            if s.startswith("/"):
+                key = posixpath.normpath(s.lstrip("/"))
+            else:
+                key = posixpath.normpath(posixpath.join(dir_, s))
+            if key in library.versioned:
+                # drop empty and "." components, but keep "..", which
+                # can't be resolved without knowing about symbolic links
+                lead = s[:len(s) - len(s.lstrip("/"))]
+                stem, suffix = posixpath.splitext(lead + "/".join(
+                    X for X in s.split("/") if X not in ("", ".")))
+                url = f"{stem}.{library.versioned[key]}{suffix}"
+            else:
+                url = s
+            latest_urls[(dir_, s)] = url
+        return url
 
     @jinja.pass_context
     def dimensions(context, s):
-        key = Path(os.path.normpath(os.path.join(context["page"].dir, s)))
+        dir_ = context["page"].dir
+        if (key := image_keys.get((dir_, s))) is None:
+            key = posixpath.normpath(posixpath.join(dir_, s))
+            image_keys[(dir_, s)] = key
         if key in library.image_info:
-            info = library.image_info[key]
+            if (info := library.image_info[key]) is None:
+                info = ImageInfo(*imagesize.get(library.content_dir / key))
+                library.image_info[key] = info
             return {"width": info.width, "height": info.height}
         return {}
 
@@ -487,23 +936,121 @@ def define_jinja_filters(library: Library, env: jinja.Environment) -> None:
     env.filters["markdown"] = markdown
 
 
-def output_site(
-        templates: Path, library: Library, public: Path, quick: bool = False
-) -> None:
+def site_fingerprint(templates: Path, library: Library) -> bytes:
+    """Calculate a fingerprint of everything that can affect the rendering of
+    any page: the code of ssg and its dependencies, the content of every
+    template and the library, apart from its tasks, which carry timestamps.
+
+    :param templates: The path to the templates directory
+    :param library: The Library object describing the site
+    :returns: The fingerprint
+    """
+    # image dimensions are read lazily, so stand in their modification times
+    images = [(X, os.stat(library.content_dir / X).st_mtime_ns)
+              for X in library.image_info]
+    parts = [CODE_FINGERPRINT, repr((
+        library.pages, library.versioned, images,
+        library.tags, library.assets)).encode()]
+    for dirpath, dirnames, filenames in os.walk(templates):
+        dirnames.sort()
+        for f in sorted(filenames):
+            path = Path(dirpath, f)
+            parts.append(path.relative_to(templates).as_posix().encode())
+            parts.append(path.read_bytes())
+    return fingerprint(*parts)
+
+
+Renderer = Callable[[Task], list[tuple[bytes, Any]]]
+
+
+def task_keys(site_key: bytes, task: Task) -> tuple[bytes, bytes]:
+    """Calculate the render cache keys of a task, as described for
+    make_renderer.
+
+    :param site_key: The site_fingerprint of templates and library
+    :param task: The task
+    :returns: A tuple of the render key and the output key
+    """
+    output_key = fingerprint(task.output_path.as_posix().encode())
+    render_key = fingerprint(site_key, task.page_id.encode(),
+                             task.template.encode(), output_key)
+    return (render_key, output_key)
+
+
+def carry_forward(
+        cache: FingerprintCache, keys: tuple[bytes, ...]
+) -> list[tuple[bytes, Any]]:
+    """Look up the entries of a skipped task, so that they are kept.
+
+    :param cache: The render cache
+    :param keys: The keys of the task's entries
+    :returns: The entries that are in the cache
+    """
+    return [(X, value) for X in keys if (value := cache.get(X)) is not None]
+
+
+def make_renderer(
+        templates: Path, library: Library, public: Path,
+        cache: Optional[FingerprintCache] = None, site_key: bytes = b"",
+        mtimes: Optional[dict[Path, Optional[int]]] = None
+) -> Renderer:
+    """Create a function that renders a single task into the public directory.
+
+    Each renderer has its own Jinja environment, so when rendering in
+    parallel one renderer is made per worker process.
+
+    If a cache is supplied, it holds two kinds of entry. The first maps a
+    fingerprint of site_key and the task to the modification time of the
+    output file when it was last rendered; if the output file still has that
+    modification time, the task is skipped. The second maps the output path
+    to a fingerprint of the output and the modification time of the file
+    that was written; if a render produces the same output and the file is
+    unchanged, the file is not rewritten. Without a cache, or without an
+    entry for the output, the previous output is read back to make the same
+    comparison.
+
+    :param templates: The path to the templates directory
+    :param library: The Library object to supply data to the templates
+    :param public: The path to the output directory
+    :param cache: An optional cache of previously rendered tasks
+    :param site_key: The site_fingerprint of templates and library
+    :param mtimes: The st_mtime_ns of output files that have already been
+        statted, keyed by task output_path, with None for missing files.
+        Other output files are statted by the renderer.
+    :returns: A function that renders a Task and writes the output. It
+        returns the cache entries for the task, if a cache is in use.
+    """
+    bytecode_dir = public.parent / CACHE_DIR / "jinja"
     jinja_env = jinja.Environment(
         loader=jinja.FileSystemLoader(templates),
-        trim_blocks=True, lstrip_blocks=True)
+        bytecode_cache=jinja.FileSystemBytecodeCache(str(bytecode_dir)),
+        auto_reload=False, trim_blocks=True, lstrip_blocks=True)
+    jinja_env.policies["json.dumps_kwargs"] = {
+        "sort_keys": True, "default": json_default}
     define_jinja_filters(library, jinja_env)
-    for task in library.tasks:
-        if quick and (public / task.output_path).exists():
-            ts = os.stat(public / task.output_path).st_mtime_ns
-            if ts > task.latest_timestamp:
-                continue
+    template_cache: dict[str, jinja.Template] = {}
+
+    def render(task: Task) -> list[tuple[bytes, Any]]:
+        output_path = public / task.output_path
+        mtime: Optional[int]
+        if mtimes is not None and task.output_path in mtimes:
+            mtime = mtimes[task.output_path]
+        else:
+            try:
+                mtime = os.stat(output_path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+        if cache is not None:
+            render_key, output_key = task_keys(site_key, task)
+            if mtime is not None and cache.get(render_key) == mtime:
+                return carry_forward(cache, (render_key, output_key))
         status_message(f"Writing {task.page_id}")
         page = library.pages[task.page_id]
-        template = jinja_env.get_template(task.template)
-        root = ("/".join(".." for X in task.output_path.parent.parts) or
-                ".") + "/"
+        if task.template not in template_cache:
+            template_cache[task.template] = jinja_env.get_template(
+                task.template)
+        template = template_cache[task.template]
+        root = "../" * len(task.output_path.parent.parts) or "./"
         try:
             output = template.render(
                 page=page, pages=library.pages,
@@ -512,11 +1059,96 @@ def output_site(
         except jinja.TemplateError as e:
             e.add_note(f"While processing content/{task.page_id}.page")
             raise e
-        output_path = public / task.output_path
-        old_output = output_path.exists() and output_path.read_text()
-        if output != old_output:
-            with open(public / task.output_path, "w") as f:
-                f.write(output)
+        data = output.encode()
+        if cache is None:
+            if mtime is None or data != read_and_stat(output_path)[0]:
+                write_file(output_path, data)
+            return []
+        digest = fingerprint(data)
+        if (previous := cache.get(output_key)) is None:
+            # no record of the output, e.g. the cache was deleted
+            unchanged = (mtime is not None and
+                         data == read_and_stat(output_path)[0])
+        else:
+            unchanged = previous == (digest, mtime)
+        if not unchanged:
+            write_file(output_path, data)
+            mtime = os.stat(output_path).st_mtime_ns
+        return [(render_key, mtime), (output_key, (digest, mtime))]
+
+    return render
+
+
+_worker_renderer: Optional[Renderer] = None
+
+
+def _init_render_worker(*args: Any) -> None:
+    global _worker_renderer
+    _worker_renderer = make_renderer(*args)
+
+
+def _render_in_worker(task: Task) -> list[tuple[bytes, Any]]:
+    assert _worker_renderer
+    return _worker_renderer(task)
+
+
+def output_site(
+        templates: Path, library: Library, public: Path, quick: bool = False,
+        cache: Optional[FingerprintCache] = None
+) -> None:
+    """Render all the tasks in library into the public directory.
+
+    Tasks are rendered by a pool of worker processes where map_in_pool finds
+    that worthwhile; the workers inherit the library from the parent rather
+    than having it pickled. Otherwise the tasks are rendered in this process.
+
+    :param templates: The path to the templates directory
+    :param library: The Library object describing the site
+    :param public: The path to the output directory
+    :param quick: Build in quick mode. Tasks whose output is newer than their
+        inputs are filtered out before any rendering begins.
+    :param cache: An optional cache of previously rendered tasks. Tasks whose
+        templates, library and output file are unchanged are not rendered.
+    """
+    (public.parent / CACHE_DIR / "jinja").mkdir(parents=True, exist_ok=True)
+    site_key = (site_fingerprint(templates, library)
+                if cache is not None else b"")
+    tasks = library.tasks
+    # output mtimes found by the quick mode check, so the renderer doesn't
+    # stat the files again
+    mtimes: dict[Path, Optional[int]] = {}
+    if quick:
+        # usually only a few tasks are stale, so drop the rest before sorting
+        # and deciding whether a process pool is worthwhile
+        def stale(task: Task) -> bool:
+            try:
+                mtime = os.stat(public / task.output_path).st_mtime_ns
+            except FileNotFoundError:
+                mtimes[task.output_path] = None
+                return True
+            if mtime <= task.latest_timestamp:
+                mtimes[task.output_path] = mtime
+                return True
+            if cache is not None:  # keep the entries of the skipped task
+                carry_forward(cache, task_keys(site_key, task))
+            return False
+        tasks = [X for X in tasks if stale(X)]
+    args = (templates, library, public, cache, site_key, mtimes)
+    # render each template's tasks consecutively, so the compiled template
+    # code stays warm (and, in parallel, each chunk uses few templates)
+    tasks = sorted(tasks, key=lambda a: a.template)
+    # output directories are usually created by copying the content, but not
+    # for pages in ignored directories; create each one once, up front
+    for dir_ in {X.output_path.parent for X in tasks}:
+        os.makedirs(public / dir_, exist_ok=True)
+    results = map_in_pool(_render_in_worker, _init_render_worker, args, tasks)
+    if results is None:
+        render = make_renderer(*args)
+        results = [render(X) for X in tasks]
+    if cache is not None:
+        for entries in results:
+            for key, value in entries:
+                cache[key] = value
     status_message("Finished")
 
 
@@ -528,6 +1160,10 @@ def build(content: Path, templates: Path, public: Path, quick: bool) -> None:
     [content] directory. It should not be used if any change that is made to a
     .page file impacts other pages.
 
+    Parsed content and a record of rendered output are kept in fingerprint
+    caches alongside public, so unchanged content is not parsed again and
+    pages are only rendered when their output may have changed.
+
     :param content: The path to the content directory
     :param templates: The path to the templates directory
     :param public: The path to the output directory
@@ -537,33 +1173,49 @@ def build(content: Path, templates: Path, public: Path, quick: bool) -> None:
 
     def ignore(dir_: str, filenames: list[str]) -> list[str]:
         ignore_list = []
+        output_dir = os.path.join(public, os.path.relpath(dir_, content))
         for f in filenames:
-            path = Path(dir_, f)
-            if path.suffix == ".page" or (path / ".ignore").exists():
+            path = os.path.join(dir_, f)
+            if os.path.splitext(f)[1] == ".page":
+                ignore_list.append(f)
+                continue
+            st = os.stat(path)
+            if stat.S_ISDIR(st.st_mode):
+                # a directory's mtime doesn't change when a file in it is
+                # modified, so directories are always descended into
+                if os.path.exists(os.path.join(path, ".ignore")):
+                    ignore_list.append(f)
+                continue
+            try:
+                mtime_public = os.stat(os.path.join(output_dir, f)).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if st.st_mtime_ns < mtime_public:
                 ignore_list.append(f)
-            else:
-                output_path = Path(public / path.relative_to(content))
-                if output_path.exists():
-                    mtime_content = os.stat(path).st_mtime_ns
-                    mtime_public = os.stat(output_path).st_mtime_ns
-                    if mtime_content < mtime_public:
-                        ignore_list.append(f)
         return ignore_list
 
     status_message("Copying content to public")
     shutil.copytree(content, public, ignore=ignore, dirs_exist_ok=True)
-    library = build_library(content)
-    output_site(templates, library, public, quick)
+    cache_dir = public.parent / CACHE_DIR
+    content_cache = FingerprintCache(cache_dir / "content.pickle")
+    library = build_library(content, content_cache)
+    content_cache.save()
+    render_cache = FingerprintCache(cache_dir / "render.pickle")
+    output_site(templates, library, public, quick, render_cache)
+    render_cache.save()
 
 
 def main() -> None:
+    # don't flush stdout for every status message
+    if isinstance(sys.stdout, io.TextIOWrapper):
+        sys.stdout.reconfigure(line_buffering=False)
     print(f"ssg version {VERSION}\n")
     try:
         if not (site_root := find_site_root()):
             raise OSError("Could not find content directory")
+        # site_root is already absolute, so no need to resolve
         content, templates, public = (
-            (site_root / X).resolve()
-            for X in ("content", "templates", "public"))
+            site_root / X for X in ("content", "templates", "public"))
         quick = len(sys.argv) > 1 and sys.argv[1] == "--quick"
         build(content, templates, public, quick)
         system_exit(0)
@@ -580,6 +1232,7 @@ def main() -> None:
 
 
 def system_exit(code: int):
+    sys.stdout.flush()
     if sys.platform == "win32":
         input("Press ENTER to exit")
     sys.exit(code)
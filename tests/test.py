@@ -1,7 +1,13 @@
 import os.path
+import dataclasses
 from pathlib import Path
 import tomllib
 import json
+import tempfile
+import shutil
+import unittest
+import unittest.mock
+import sys
 
 from pyfakefs.fake_filesystem_unittest import (   # type: ignore
     TestCase as FFTestCase
@@ -17,7 +23,11 @@ from ssg.main import (
     build_library,
     output_site,
     build,
-    asset_list,)
+    asset_list,
+    FingerprintCache,
+    Siblings,
+    fingerprint,
+    PARALLEL_THRESHOLD,)
 
 
 def page_for_testing(page_path, **kwargs):
@@ -32,7 +42,7 @@ def page_for_testing(page_path, **kwargs):
         data={},
         weight=0,
         tags=[])
-    return retval._replace(**kwargs)
+    return dataclasses.replace(retval, **kwargs)
 
 
 class TestContentProcessing(FFTestCase):
@@ -56,6 +66,21 @@ class TestContentProcessing(FFTestCase):
             process_content(Path("/test.json")),
             expected)
 
+    def test_big_integer_json(self):
+        with open("/test.json", "w") as f:
+            f.write('{"a": 123456789012345678901234567890, "b": 1}')
+        expected = {"a": 123456789012345678901234567890, "b": 1}
+        self.assertEqual(process_content(Path("/test.json")), expected)
+        # an orjson stand-in that, like orjson, loses big integers: it must
+        # not be used for this file
+        lossy = unittest.mock.Mock(
+            loads=lambda data: json.loads(data, parse_int=float),
+            JSONDecodeError=json.JSONDecodeError)
+        with unittest.mock.patch("ssg.main.orjson", lossy):
+            result = process_content(Path("/test.json"))
+        self.assertEqual(result, expected)
+        self.assertIsInstance(result["a"], int)
+
     def test_simple_text_processing(self):
         with open("/test.html", "w") as f:
             f.write('<html></html>')
@@ -104,6 +129,58 @@ class TestContentProcessing(FFTestCase):
                     'c': 'shard """c'}
         self.assertEqual(process_content(Path("/test.md")), expected)
 
+    def test_shards_with_backslash(self):
+        with open("/test.md", "w") as f:
+            f.write('<!-- shard: a -->\nC:\\dir\\n')
+        self.assertEqual(process_content(Path("/test.md")),
+                         {'a': 'C:\\dir\\n'})
+
+    def test_conflicting_shards(self):
+        with open("/test.md", "w") as f:
+            f.write("\n".join(('<!-- shard: a -->',
+                               'shard a',
+                               '<!-- shard: a.b -->',
+                               'shard a.b')))
+        with self.assertRaises(TypeError) as cm:
+            process_content(Path("/test.md"))
+        self.assertNotEqual(str(cm.exception).find("conflicts"), -1)
+
+
+class TestFingerprintCache(FFTestCase):
+
+    def setUp(self):
+        self.setUpPyfakefs()
+
+    def test_fingerprint_cache(self):
+        cache = FingerprintCache(Path("/cache/test.pickle"))
+        self.assertEqual(cache.get(b"a"), None)
+        cache[b"a"], cache[b"b"] = 1, 2
+        cache.save()
+        cache = FingerprintCache(Path("/cache/test.pickle"))
+        self.assertEqual(cache.get(b"a"), 1)
+        cache.save()
+        # b was not used, so was discarded on save
+        cache = FingerprintCache(Path("/cache/test.pickle"))
+        self.assertEqual(cache.get(b"a"), 1)
+        self.assertEqual(cache.get(b"b"), None)
+        cache.save()
+        # a cache written by different code is discarded
+        with unittest.mock.patch("ssg.main.CODE_FINGERPRINT", b"other"):
+            cache = FingerprintCache(Path("/cache/test.pickle"))
+        self.assertEqual(cache.get(b"a"), None)
+
+    def test_cached_content(self):
+        with open("/test.toml", "w") as f:
+            f.write("simple = 'string'\n")
+        cache = FingerprintCache(Path("/cache/test.pickle"))
+        first = process_content(Path("/test.toml"), cache)
+        self.assertEqual(first, {"simple": "string"})
+        self.assertIs(process_content(Path("/test.toml"), cache), first)
+        with open("/test.toml", "w") as f:
+            f.write("simple = 'changed'\n")
+        self.assertEqual(process_content(Path("/test.toml"), cache),
+                         {"simple": "changed"})
+
 
 class TestSSGMisc(FFTestCase):
 
@@ -126,6 +203,21 @@ class TestSSGMisc(FFTestCase):
         os.chdir("/root")
         self.assertEqual(find_site_root(), None)
 
+    def test_siblings(self):
+        siblings = Siblings(("a", "b", "c"), 1)
+        self.assertEqual(siblings, ["a", "c"])
+        self.assertEqual(len(siblings), 2)
+        self.assertEqual((siblings[0], siblings[1], siblings[-1]),
+                         ("a", "c", "c"))
+        self.assertEqual(siblings[::-1], ["c", "a"])
+        with self.assertRaises(IndexError):
+            siblings[2]
+        self.assertEqual(Siblings(("a", "b")), ("a", "b"))
+        self.assertEqual(repr(siblings), "['a', 'c']")
+        self.assertEqual(siblings + ["d"], ["a", "c", "d"])
+        self.assertEqual(["d"] + siblings, ["d", "a", "c"])
+        self.assertEqual(siblings + siblings, ["a", "c", "a", "c"])
+
 
 class TestLibraryBuild(FFTestCase):
 
@@ -172,7 +264,8 @@ class TestLibraryBuild(FFTestCase):
                           'subdir/subsubdir/sib_2'],
                 lighter=None, heavier=None, weight=None))
         self.assertEqual(
-            sorted(X._replace(latest_timestamp=0) for X in library.tasks),
+            sorted(dataclasses.replace(X, latest_timestamp=0)
+                   for X in library.tasks),
             sorted([
                 Task(page_id='test',
                      latest_timestamp=0,
@@ -227,6 +320,14 @@ class TestLibraryBuild(FFTestCase):
             with self.assertRaises(TypeError) as cm:
                 library = build_library(Path("/content"))
             self.assertNotEqual(str(cm.exception).find("must be a string"), -1)
+        os.remove("/content/subdir/test.page")
+        with self.subTest("dotted page id"):
+            with open("/content/subdir/v1.2.page", "w") as f:
+                f.write("template = 'test'\n")
+            library = build_library(Path("/content"))
+            self.assertEqual(
+                library.pages["subdir/v1.2"],
+                page_for_testing("subdir/v1.2.page"))
 
     def test_malformed_page_file(self):
         os.makedirs("/content")
@@ -274,16 +375,18 @@ class TestLibraryBuild(FFTestCase):
 
     def test_assets(self):
         os.makedirs("/content/js/")
-        os.makedirs("/content/ignoreme")
+        os.makedirs("/content/ignoreme/nested")
         for path in ["/content/test.txt", "/content/test.page", "w",
                      "/content/js/test.js", "/content/ignoreme/.ignore",
-                     "/content/ignoreme/ignore_this"]:
+                     "/content/ignoreme/ignore_this",
+                     "/content/ignoreme/nested/ignore_this_too"]:
             with open(path, "w") as f:
                 f.write("")
         library = build_library(Path("/content"))
         self.assertEqual(
             library.assets,
             [Path("test.txt"), Path("js/test.js")])
+        self.assertEqual(asset_list(Path("/content")), library.assets)
 
 
 class TestCustomFilters(FFTestCase):
@@ -306,7 +409,7 @@ class TestCustomFilters(FFTestCase):
         # a relative URL
         context = {"page": page_for_testing("test/dir/page.page")}
         library.versioned.update({
-            Path("test/dir/my/style.css"): 1,
+            "test/dir/my/style.css": 1,
         })
         self.assertEqual(latest(context, "my/style.css"),
                          "my/style.1.css")
@@ -320,6 +423,17 @@ class TestCustomFilters(FFTestCase):
         self.assertEqual(latest(context, "/test/dir/my/style.css"),
                          "/test/dir/my/style.1.css")
 
+    def test_siblings_in_template(self):
+        for name in ("a", "b"):
+            with open(f"/site/content/{name}.page", "w") as f:
+                f.write("template = 'test.jinja'\n")
+        with open("/site/templates/test.jinja", "w") as f:
+            f.write("{{page.siblings|tojson}} {{page.siblings + ['x']}}")
+        library = build_library(Path("/site/content"))
+        output_site(Path("/site/templates"), library, Path("/site/public"))
+        self.assertEqual(Path("/site/public/a.html").read_text(),
+                         "[\"b\"] ['b', 'x']")
+
     def test_markdown_filter(self):
         with open("/site/content/test.page", "w") as f:
             f.write("template = 'test.jinja'\ncontent.main = 'test.md'\n")
@@ -332,13 +446,29 @@ class TestCustomFilters(FFTestCase):
         self.assertEqual(Path("/site/public/test.html").read_text(),
                          "<h1>Heading</h1>\n<p>Paragraph</p>\n")
 
+    def test_dimensions_filter(self):
+        os.makedirs("/site/content/img")
+        with open("/site/content/img/test.png", "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR"
+                    b"\x00\x00\x00\x07\x00\x00\x00\x09\x08\x02\x00\x00\x00")
+        with open("/site/content/test.page", "w") as f:
+            f.write("template = 'test.jinja'\n")
+        with open("/site/templates/test.jinja", "w") as f:
+            f.write("{% set d = 'img/test.png' | dimensions %}"
+                    "{{d.width}}x{{d.height}}")
+        library = build_library(Path("/site/content"))
+        # image headers are only read when the filter needs them
+        self.assertEqual(library.image_info, {"img/test.png": None})
+        output_site(Path("/site/templates"), library, Path("/site/public"))
+        self.assertEqual(Path("/site/public/test.html").read_text(), "7x9")
+
     def test_versioning_filter(self):
         os.makedirs("/content/css")
         for n in range(3, 6):
             with open(f"/content/css/test.{n}.css", "w") as f:
                 f.write("")
         library = build_library(Path("/content"))
-        self.assertEqual(library.versioned, {Path('css/test.css'): 5})
+        self.assertEqual(library.versioned, {'css/test.css': 5})
 
 
 class TestQuickBuild(FFTestCase):
@@ -401,3 +531,108 @@ class TestQuickBuild(FFTestCase):
         quick_build()
         with open("/site/public/test.html") as f:
             self.assertEqual(f.read(), "1 Test content!")
+
+    def test_quick_build_keeps_render_cache(self):
+        with open("/site/content/test.page", "w") as f:
+            f.write('template = "test.jinja"\n')
+        with open("/site/templates/test.jinja", "w") as f:
+            f.write("{{page.id}}")
+
+        def build_site(quick):
+            build(Path("/site/content"), Path("/site/templates"),
+                  Path("/site/public"), quick)
+        build_site(False)
+        ts = os.stat("/site/public/test.html").st_mtime_ns
+        # a quick build skips the page, but keeps its cache entries, so the
+        # next full build doesn't need to render it again
+        build_site(True)
+        with unittest.mock.patch("ssg.main.status_message") as message:
+            build_site(False)
+        self.assertNotIn(unittest.mock.call("Writing test"),
+                         message.call_args_list)
+        self.assertEqual(os.stat("/site/public/test.html").st_mtime_ns, ts)
+
+    def test_deleted_cache(self):
+        with open("/site/content/test.page", "w") as f:
+            f.write('template = "test.jinja"\n')
+        with open("/site/templates/test.jinja", "w") as f:
+            f.write("{{page.id}}")
+        build(Path("/site/content"), Path("/site/templates"),
+              Path("/site/public"), False)
+        shutil.rmtree("/site/.ssg-cache")
+        # unchanged output is not rewritten, even without a cache entry
+        with unittest.mock.patch("ssg.main.write_file") as write_file:
+            build(Path("/site/content"), Path("/site/templates"),
+                  Path("/site/public"), False)
+        write_file.assert_not_called()
+
+    def test_page_in_ignored_directory(self):
+        os.makedirs("/site/content/hidden/deeper")
+        with open("/site/content/hidden/.ignore", "w") as f:
+            f.write("")
+        with open("/site/content/hidden/deeper/test.page", "w") as f:
+            f.write('template = "test.jinja"\n')
+        with open("/site/templates/test.jinja", "w") as f:
+            f.write("{{page.id}}")
+        build(Path("/site/content"), Path("/site/templates"),
+              Path("/site/public"), False)
+        with open("/site/public/hidden/deeper/test.html") as f:
+            self.assertEqual(f.read(), "hidden/deeper/test")
+        self.assertFalse(os.path.exists("/site/public/hidden/.ignore"))
+
+
+class TestQuickBuildDirectories(unittest.TestCase):
+
+    # pyfakefs doesn't update the mtime of a directory when a file is added
+    # to it, so this test uses a real temporary directory
+    def test_static_file_in_output_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            site = Path(tmp)
+            os.makedirs(site / "content/sub")
+            os.makedirs(site / "templates")
+            (site / "templates/test.jinja").write_text("page")
+            (site / "content/sub/test.page").write_text(
+                "template = 'test.jinja'\n")
+            (site / "content/sub/test.css").write_text("test")
+            build(site / "content", site / "templates", site / "public",
+                  True)
+            (site / "content/sub/test.css").write_text("changed")
+            # writing sub/test.html made public/sub newer than content/sub;
+            # make sure of it with coarse timestamps
+            os.utime(site / "public/sub", ns=(
+                os.stat(site / "content/sub/test.css").st_mtime_ns + 1,) * 2)
+            build(site / "content", site / "templates", site / "public",
+                  True)
+            self.assertEqual((site / "public/sub/test.css").read_text(),
+                             "changed")
+
+
+@unittest.skipUnless(sys.platform == "linux",
+                     "process pools are only used on Linux")
+class TestParallelOutput(unittest.TestCase):
+
+    # forked workers cannot write to a pyfakefs filesystem, so this test uses
+    # a real temporary directory
+    def test_parallel_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            site = Path(tmp)
+            os.makedirs(site / "content/sub")
+            os.makedirs(site / "templates")
+            os.makedirs(site / "public/sub")
+            with open(site / "templates/test.jinja", "w") as f:
+                f.write("{{root}}{{page.id}}")
+            for n in range(PARALLEL_THRESHOLD):
+                with open(site / f"content/sub/p{n}.page", "w") as f:
+                    f.write("template = 'test.jinja'\n")
+            cache = FingerprintCache(site / "cache.pickle")
+            library = build_library(site / "content", cache)
+            self.assertEqual(len(library.pages), PARALLEL_THRESHOLD)
+            # entries made by the workers are returned to the parent's cache
+            self.assertEqual(
+                cache.get(fingerprint(b".toml", b"template = 'test.jinja'\n")),
+                {"template": "test.jinja"})
+            output_site(site / "templates", library, site / "public")
+            for n in range(PARALLEL_THRESHOLD):
+                self.assertEqual(
+                    (site / f"public/sub/p{n}.html").read_text(),
+                    f"../sub/p{n}")